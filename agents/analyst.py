@@ -1,7 +1,13 @@
 # agents/analyst.py
-import os, json
+import os, json, hashlib
 from pathlib import Path
-from core.memory_manager import MemoryManager
+from core.memory_manager import MemoryManager, EMBED_BATCH
+from core.chunker import iter_chunks
+from core.file_lock import file_lock, write_atomic
+
+# files already chunked into memory: path -> [mtime_ns, size, sha256], plus seen content hashes
+INGESTED_FILE = Path("memory_ingested.json")
+INGESTED_LOCK = Path("memory_ingested.lock")
 
 class Analyst:
     def __init__(self):
@@ -12,24 +18,79 @@ class Analyst:
         # Placeholder: if Gumroad token is available, call sales endpoint.
         return {"status":"noop","reason":"not_implemented"}
 
+    def _load_ingested(self):
+        if not INGESTED_FILE.exists():
+            return {"files": {}, "hashes": {}}
+        try:
+            return json.loads(INGESTED_FILE.read_text(encoding="utf-8"))
+        except Exception:
+            # a damaged record only costs a re-ingest
+            return {"files": {}, "hashes": {}}
+
+    def _save_ingested(self, ingested):
+        write_atomic(INGESTED_FILE, json.dumps(ingested, indent=2, ensure_ascii=False))
+
+    @staticmethod
+    def _content_hash(path):
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                h.update(block)
+        return h.hexdigest()
+
     def analyze_recent(self):
-        # scan outputs folder and add short summaries to memory
+        # one ingestion pass at a time, so concurrent Analyst tasks (worker mode) don't both
+        # chunk the same files or overwrite each other's record
+        with file_lock(INGESTED_LOCK):
+            return self._ingest_outputs()
+
+    def _ingest_outputs(self):
+        # stream markdown outputs into memory as heading/token-window chunks, once per file content
         out = Path("outputs")
+        ingested = self._load_ingested()
         count=0
+        skipped=0
+        batch, metas = [], []
         for d in out.iterdir():
             if d.is_dir():
-                text=""
                 for f in d.glob("*.md"):
-                    text += f.read_text(encoding="utf-8")[:1000]
-                if text:
-                    self.mem.add(text, {"source":str(d)})
-                    count+=1
+                    st = f.stat()
+                    sig = [st.st_mtime_ns, st.st_size]
+                    seen = ingested["files"].get(str(f))
+                    if seen and seen[:2] == sig:
+                        skipped+=1
+                        continue
+                    # memo-linked outputs and reruns carry identical content under a new task_id
+                    digest = self._content_hash(f)
+                    if digest in ingested["hashes"]:
+                        ingested["files"][str(f)] = sig + [digest]
+                        skipped+=1
+                        continue
+                    for chunk in iter_chunks(f):
+                        batch.append(chunk["text"])
+                        metas.append({"source":str(d), "task_id":d.name, "file":f.name,
+                                      "offset":chunk["offset"], "heading":chunk["heading"]})
+                        if len(batch) >= EMBED_BATCH:
+                            self.mem.add_batch(batch, metas)
+                            count += len(batch)
+                            batch, metas = [], []
+                            # every file recorded so far is fully flushed now
+                            self._save_ingested(ingested)
+                    ingested["files"][str(f)] = sig + [digest]
+                    ingested["hashes"][digest] = str(f)
+        if batch:
+            self.mem.add_batch(batch, metas)
+            count += len(batch)
+        self._save_ingested(ingested)
         self.mem.save()
-        return {"indexed":count}
+        return {"indexed":count, "skipped":skipped}
 
     def run(self, task):
         action = task.get("payload",{}).get("action","analyze")
         if action=="analyze":
             return self.analyze_recent()
+        elif action=="search":
+            payload = task.get("payload",{})
+            return {"hits": self.mem.search(payload.get("query",""), k=payload.get("k",5))}
         else:
             return {"status":"noop"}
@@ -2,6 +2,14 @@
 import os, requests, json
 from pathlib import Path
 
+# prefixes call_llm puts on placeholder/error outputs (instead of generated content)
+LLM_MISSING = "[LLM_MISSING]"
+LLM_HTTP_ERROR = "[HTTP "
+LLM_PARSE_ERROR = "[ParseError]"
+LLM_EMPTY = "[Empty response]"
+LLM_CALL_ERROR = "[ERROR calling LLM]"
+LLM_ERROR_PREFIXES = (LLM_MISSING, LLM_HTTP_ERROR, LLM_PARSE_ERROR, LLM_EMPTY, LLM_CALL_ERROR)
+
 class Creator_Writer:
     def __init__(self):
         self.name = "Creator.Writer"
@@ -21,7 +29,7 @@ class Creator_Writer:
 
     def call_llm(self, prompt, max_tokens=1500):
         if not self.api_key:
-            return f"[LLM_MISSING] Would generate: {prompt[:300]}"
+            return f"{LLM_MISSING} Would generate: {prompt[:300]}"
 
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -45,15 +53,15 @@ class Creator_Writer:
             resp = requests.post(self.url, headers=headers, json=payload, timeout=120)
             if resp.status_code != 200:
                 # return debug-friendly message (no secrets)
-                return f"[HTTP {resp.status_code}] {resp.text[:400]}"
+                return f"{LLM_HTTP_ERROR}{resp.status_code}] {resp.text[:400]}"
             try:
                 data = resp.json()
             except json.JSONDecodeError:
-                return f"[ParseError] Non-JSON response: {resp.text[:400]}"
+                return f"{LLM_PARSE_ERROR} Non-JSON response: {resp.text[:400]}"
             content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
-            return content or "[Empty response]"
+            return content or LLM_EMPTY
         except Exception as e:
-            return f"[ERROR calling LLM] {e}"
+            return f"{LLM_CALL_ERROR} {e}"
 
     def create_prompt_pack(self, topic):
         prompt = (
@@ -116,7 +116,8 @@ class AtlasPlanner:
         """
         cmd = self.command or "Autonomous: create one prompt pack and one ebook today for student productivity."
         # optionally consult memory for best topics
-        recent = self.mem.summary_recent(10)
+        # metadata filter is resolved by MemoryAgent's secondary index (no full scan)
+        recent = self.mem.summary_recent(10, filters={"topic": None})
         topics = []
         for item in recent:
             meta = item.get("metadata", {})
@@ -2,36 +2,176 @@
 """
 MemoryAgent: lightweight FAISS-backed memory + JSON logs.
 Stores: publications, task results, trust metrics, experiment outcomes.
-Provides: add_memory(content, metadata), query_similar(query, k=5), summary_recent(n=10)
+Provides: add_memory(content, metadata), query_similar(query, k=5), summary_recent(n=10),
+query(text, filters, k=5) for metadata-filtered hybrid (BM25 keyword + vector) retrieval.
 """
-import os, json, time
+import os, json, time, re, math
+from collections import defaultdict
 from pathlib import Path
 from sentence_transformers import SentenceTransformer
 import numpy as np
 import faiss
+from core.file_lock import file_lock, file_sig, write_atomic
 
 BASE = Path("memory")
 BASE.mkdir(parents=True, exist_ok=True)
 STORE = BASE / "memory_store.jsonl"
 INDEX = BASE / "memory.index"
+META_INDEX = BASE / "memory_meta.json"  # persisted row offsets + metadata secondary index
+LOCK = BASE / "memory.lock"
 MODEL_NAME = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
 _EMB_DIM = 384  # matches all-MiniLM-L6-v2
+# BM25 parameters (standard defaults)
+_BM25_K1 = 1.5
+_BM25_B = 0.75
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def _tokenize(text):
+    return _TOKEN_RE.findall(str(text).lower())
+
+def _value_key(value):
+    # metadata values are indexed by their JSON form so 1, "1" and True stay distinct
+    return json.dumps(value, ensure_ascii=False)
 
 class MemoryAgent:
     def __init__(self):
         self.store_path = str(STORE)
         self.index_path = str(INDEX)
+        self.meta_path = str(META_INDEX)
         self.model = SentenceTransformer(MODEL_NAME)
+        # ensure store exists
+        open(self.store_path, "a").close()
+        # row i == FAISS vector i == store line i (blank/unparseable lines are empty rows)
+        self._offsets = []  # row -> byte offset of its store line
+        self._store_pos = 0  # bytes of the store already indexed
+        self._meta_index = defaultdict(lambda: defaultdict(set))  # field -> value key -> {row}
+        self._items = {}  # row -> parsed item, filled on demand
+        # BM25 inverted index, built on the first text query
+        self._postings = None
+        self._doc_len = {}
+        self._total_len = 0
+        self._index_sig = None
+        with file_lock(LOCK):
+            self._load_index()
+            self._load_meta()
+            if self._catch_up():
+                self._save_meta()
+
+    # --- persistence ---
+
+    def _load_index(self):
         # load or create FAISS index
+        self.index = faiss.IndexFlatL2(_EMB_DIM)
         if Path(self.index_path).exists():
             try:
                 self.index = faiss.read_index(self.index_path)
             except Exception:
-                self.index = faiss.IndexFlatL2(_EMB_DIM)
-        else:
-            self.index = faiss.IndexFlatL2(_EMB_DIM)
-        # ensure store exists
-        open(self.store_path, "a").close()
+                pass
+        self._index_sig = file_sig(self.index_path)
+
+    def _load_meta(self):
+        """Load the persisted secondary index; it is discarded if the store no longer matches it."""
+        if not Path(self.meta_path).exists():
+            return
+        try:
+            meta = json.loads(Path(self.meta_path).read_text(encoding="utf-8"))
+        except Exception:
+            return
+        if meta.get("store_pos", 0) > os.path.getsize(self.store_path):
+            return
+        self._offsets = meta["offsets"]
+        self._store_pos = meta["store_pos"]
+        for field, by_value in meta["fields"].items():
+            for vkey, rows in by_value.items():
+                self._meta_index[field][vkey] = set(rows)
+
+    def _save_meta(self):
+        meta = {
+            "store_pos": self._store_pos,
+            "offsets": self._offsets,
+            "fields": {f: {v: sorted(rows) for v, rows in by_value.items()} for f, by_value in self._meta_index.items()},
+        }
+        write_atomic(self.meta_path, json.dumps(meta, ensure_ascii=False))
+
+    def _catch_up(self):
+        """Index store lines appended since the last call (by this or another process)."""
+        if os.path.getsize(self.store_path) <= self._store_pos:
+            return False
+        with open(self.store_path, "rb") as f:
+            f.seek(self._store_pos)
+            for raw in f:
+                row = len(self._offsets)
+                self._offsets.append(self._store_pos)
+                self._store_pos += len(raw)
+                item = self._parse(raw)
+                self._index_item(row, item)
+        return True
+
+    def _refresh(self):
+        """Pick up writes from other processes sharing the store and index."""
+        if os.path.getsize(self.store_path) > self._store_pos or file_sig(self.index_path) != self._index_sig:
+            with file_lock(LOCK):
+                if file_sig(self.index_path) != self._index_sig:
+                    self._load_index()
+                if self._catch_up():
+                    self._save_meta()
+
+    @staticmethod
+    def _parse(raw):
+        line = raw.decode("utf-8", errors="replace").strip()
+        if not line:
+            return None
+        try:
+            item = json.loads(line)
+        except Exception:
+            return None
+        return item if isinstance(item, dict) else None
+
+    def _item(self, row):
+        """Read one row from the store by offset (no full scan)."""
+        if row in self._items:
+            return self._items[row]
+        if not 0 <= row < len(self._offsets):
+            return None
+        with open(self.store_path, "rb") as f:
+            f.seek(self._offsets[row])
+            item = self._parse(f.readline())
+        self._items[row] = item
+        return item
+
+    # --- indexing ---
+
+    def _index_item(self, row, item):
+        if item is None:
+            return
+        meta = item.get("metadata") or {}
+        if isinstance(meta, dict):
+            for field, value in meta.items():
+                values = value if isinstance(value, (list, tuple)) else [value]
+                for v in values:
+                    if isinstance(v, (str, int, float, bool)):
+                        self._meta_index[field][_value_key(v)].add(row)
+        if self._postings is not None:
+            self._index_terms(row, item)
+
+    def _index_terms(self, row, item):
+        tokens = _tokenize(item.get("content", ""))
+        for tok in tokens:
+            self._postings[tok][row] = self._postings[tok].get(row, 0) + 1
+        self._doc_len[row] = len(tokens)
+        self._total_len += len(tokens)
+
+    def _ensure_postings(self):
+        """Build the BM25 inverted index with one pass over the store, only when a text query needs it."""
+        if self._postings is not None:
+            return
+        self._postings = defaultdict(dict)
+        with open(self.store_path, "rb") as f:
+            f.seek(0)
+            for row in range(len(self._offsets)):
+                item = self._parse(f.readline())
+                if item is not None:
+                    self._index_terms(row, item)
 
     def _write_store(self, item):
         with open(self.store_path, "a", encoding="utf-8") as f:
@@ -44,41 +184,159 @@ class MemoryAgent:
         """
         mem_id = f"mem-{int(time.time()*1000)}"
         emb = self.model.encode([content]).astype("float32")
-        self.index.add(emb)
         item = {"id": mem_id, "content": content, "metadata": metadata, "ts": time.time()}
-        self._write_store(item)
-        # persist index
-        faiss.write_index(self.index, self.index_path)
+        # store line and FAISS vector are appended together under the lock so rows stay aligned
+        with file_lock(LOCK):
+            if file_sig(self.index_path) != self._index_sig:
+                self._load_index()
+            self._catch_up()
+            self.index.add(emb)
+            self._write_store(item)
+            self._catch_up()
+            # persist index
+            faiss.write_index(self.index, self.index_path)
+            self._index_sig = file_sig(self.index_path)
+            self._save_meta()
         return mem_id
 
+    # --- retrieval ---
+
     def query_similar(self, query, k=5):
         """
         Return up to k similar memory items (content + metadata).
         """
+        self._refresh()
         emb = self.model.encode([query]).astype("float32")
         if self.index.ntotal == 0:
             return []
         D, I = self.index.search(emb, k)
         results = []
-        # read store lines to list
-        with open(self.store_path, "r", encoding="utf-8") as f:
-            lines = f.read().strip().splitlines()
         for idx in I[0]:
-            if idx < len(lines):
-                try:
-                    obj = json.loads(lines[idx])
-                    results.append(obj)
-                except Exception:
-                    continue
+            item = self._item(int(idx)) if idx >= 0 else None
+            if item is not None:
+                results.append(item)
         return results
 
-    def summary_recent(self, n=10):
-        """Return last n memory items (most recent)."""
-        with open(self.store_path, "r", encoding="utf-8") as f:
-            lines = f.read().strip().splitlines()
-        if not lines:
+    def _filter_rows(self, filters):
+        """
+        Resolve metadata filters to a set of rows using the secondary indexes.
+        filters: {field: value}; value may be a list (any of) or None (field present).
+        Returns None when no filters are given (i.e. all rows).
+        """
+        if not filters:
+            return None
+        rows = None
+        # intersect smallest sets first so cost tracks the matching subset
+        resolved = []
+        for field, value in filters.items():
+            by_value = self._meta_index.get(field, {})
+            if value is None:
+                matched = set().union(*by_value.values()) if by_value else set()
+            elif isinstance(value, (list, tuple, set)):
+                matched = set().union(*(by_value.get(_value_key(v), set()) for v in value)) if value else set()
+            else:
+                matched = by_value.get(_value_key(value), set())
+            resolved.append(matched)
+        for matched in sorted(resolved, key=len):
+            rows = set(matched) if rows is None else rows & matched
+            if not rows:
+                break
+        return rows
+
+    def _bm25_scores(self, text, rows=None):
+        """BM25 score per row for the query text, restricted to rows when given."""
+        self._ensure_postings()
+        scores = defaultdict(float)
+        n_docs = len(self._doc_len)
+        if not n_docs:
+            return scores
+        avg_len = (self._total_len / n_docs) or 1.0
+        for tok in set(_tokenize(text)):
+            postings = self._postings.get(tok)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            if rows is not None and len(rows) < len(postings):
+                hits = ((r, postings[r]) for r in rows if r in postings)
+            else:
+                hits = ((r, tf) for r, tf in postings.items() if rows is None or r in rows)
+            for r, tf in hits:
+                norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * self._doc_len[r] / avg_len)
+                scores[r] += idf * tf * (_BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def _vector_distances(self, emb, rows):
+        """Exact L2 distances from emb to the given rows (reconstructed from the flat index)."""
+        rows = [r for r in rows if r < self.index.ntotal]
+        if not rows:
+            return {}
+        vecs = np.vstack([self.index.reconstruct(int(r)) for r in rows])
+        dists = ((vecs - emb) ** 2).sum(axis=1)
+        return dict(zip(rows, dists.tolist()))
+
+    def query(self, text=None, filters=None, k=5, alpha=0.5):
+        """
+        Hybrid retrieval: metadata filters are applied first via the secondary indexes, then
+        BM25 keyword scores and vector similarity are fused on the remaining rows.
+        alpha weights the vector score (1.0 = vector only, 0.0 = keyword only).
+        Without text, returns the k most recent matching items.
+        """
+        self._refresh()
+        rows = self._filter_rows(filters)
+        if not text:
+            pool = sorted(rows, reverse=True) if rows is not None else range(len(self._offsets) - 1, -1, -1)
+            recent = []
+            for r in pool:
+                if len(recent) >= k:
+                    break
+                item = self._item(r)
+                if item is not None:
+                    recent.append(item)
+            return recent[::-1]
+        if rows is not None and not rows:
             return []
-        last = lines[-n:]
-        return [json.loads(l) for l in last]
+        keyword = self._bm25_scores(text, rows) if alpha < 1 else {}
+        vector = {}
+        if alpha > 0 and self.index.ntotal:
+            emb = self.model.encode([text]).astype("float32")
+            if rows is None:
+                # unfiltered: take the top vector hits from FAISS, then score keyword hits exactly
+                D, I = self.index.search(emb, min(self.index.ntotal, max(k * 4, k)))
+                vector = {int(i): float(d) for d, i in zip(D[0], I[0]) if i >= 0}
+                missing = [r for r in keyword if r not in vector]
+                vector.update(self._vector_distances(emb[0], missing))
+            else:
+                vector = self._vector_distances(emb[0], rows)
+        fused = self._fuse(keyword, vector, alpha)
+        ranked = sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
+        results = []
+        for r, score in ranked:
+            item = self._item(r)
+            if item is None:
+                continue
+            results.append(dict(item, score=round(score, 6)))
+            if len(results) >= k:
+                break
+        return results
+
+    @staticmethod
+    def _fuse(keyword, vector, alpha):
+        """Min-max normalise both score sets and combine them with weight alpha on the vector side."""
+        fused = defaultdict(float)
+        if keyword:
+            top = max(keyword.values()) or 1.0
+            for r, s in keyword.items():
+                fused[r] += (1 - alpha) * s / top
+        if vector:
+            lo, hi = min(vector.values()), max(vector.values())
+            span = (hi - lo) or 1.0
+            for r, d in vector.items():
+                # smaller distance -> higher similarity
+                fused[r] += alpha * (1 - (d - lo) / span)
+        return fused
+
+    def summary_recent(self, n=10, filters=None):
+        """Return last n memory items (most recent), optionally restricted by metadata filters."""
+        return self.query(filters=filters, k=n)
 
 # quick CLI test helpers (import & call MemoryAgent().add_memory(...))
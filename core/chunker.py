@@ -0,0 +1,52 @@
+# core/chunker.py
+"""
+Streaming chunker for large markdown artifacts.
+Reads a file line by line, starts a new chunk at every markdown heading and splits long
+sections into token windows with overlap. Only the current window is held in memory.
+"""
+import os, re
+
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", 200))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 40))
+_HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s")
+_TOKEN_RE = re.compile(r"\S+")
+
+def iter_chunks(path, max_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP):
+    """
+    Yield {"text", "offset", "heading"} dicts for the file at path.
+    offset is the character offset of the chunk start in the file; text is the exact passage.
+    """
+    overlap = max(0, min(overlap, max_tokens - 1))
+    heading = None
+    words = []  # (start, end) character offsets of tokens in the current window
+    fresh = 0   # tokens in the window not yet emitted in a previous chunk
+    buf, base = "", 0  # raw text of the current window, starting at file offset base
+    pos = 0
+
+    def _chunk(span):
+        start, end = span[0][0], span[-1][1]
+        return {"text": buf[start - base:end - base], "offset": start, "heading": heading}
+
+    # newline="" keeps \r\n intact so offsets match the file on disk
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for line in f:
+            if _HEADING_RE.match(line):
+                if fresh:
+                    yield _chunk(words)
+                words, fresh = [], 0
+                heading = line.strip().lstrip("#").strip()
+            if not words:
+                buf, base = "", pos
+            buf += line
+            for m in _TOKEN_RE.finditer(line):
+                words.append((pos + m.start(), pos + m.end()))
+                fresh += 1
+                if len(words) >= max_tokens:
+                    yield _chunk(words)
+                    words = words[max_tokens - overlap:]
+                    fresh = 0
+                    if words:
+                        buf, base = buf[words[0][0] - base:], words[0][0]
+            pos += len(line)
+    if fresh:
+        yield _chunk(words)
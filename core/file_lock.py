@@ -0,0 +1,30 @@
+# core/file_lock.py
+import os, fcntl
+from contextlib import contextmanager
+from pathlib import Path
+
+@contextmanager
+def file_lock(path):
+    """Exclusive advisory lock on path, shared by every process using the same file."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def write_atomic(path, text):
+    """Write text to path via a temp file + os.replace, so readers never see a partial file."""
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def file_sig(path):
+    """(mtime_ns, size) of path, or None if missing; cheap check for writes by another process."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
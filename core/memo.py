@@ -0,0 +1,124 @@
+# core/memo.py
+"""
+Input-hash memoization of task execution (build-system style).
+A task's key hashes (target agent, payload, agent code version, relevant env); a key that
+already produced artifacts is completed by linking those outputs instead of re-running.
+"""
+import os, json, time, shutil, hashlib
+from importlib.util import find_spec
+from pathlib import Path
+from core.file_lock import file_lock, write_atomic
+from agents.creator_writer import LLM_ERROR_PREFIXES
+
+MEMO_FILE = Path("memory/task_memo.json")
+LOCK_FILE = Path("memory/task_memo.lock")
+# env that changes what agents produce (secrets are reduced to present/absent)
+MEMO_ENV = ("LLM_MODEL", "LLM_API_BASE", "LLM_TEMPERATURE", "EMBEDDING_MODEL")
+MEMO_SECRETS = ("LLM_API_KEY", "GUMROAD_ACCESS_TOKEN", "REDDIT_CLIENT_ID")
+# only agents whose whole effect is the artifacts they return; the others read mutable state
+# (queue, memory, counters) or exist for side effects (uploads, posts, outputs/latest_offer.json)
+MEMOIZABLE = {"Creator.Writer"}
+
+_code_versions = {}
+
+def _locked():
+    return file_lock(LOCK_FILE)
+
+def _load():
+    if not MEMO_FILE.exists():
+        return {"keys": {}}
+    try:
+        return json.loads(MEMO_FILE.read_text(encoding="utf-8"))
+    except Exception:
+        return {"keys": {}}
+
+def _save(memo):
+    write_atomic(MEMO_FILE, json.dumps(memo, indent=2, ensure_ascii=False))
+
+def code_version(module_path):
+    """Hash of the agent module's source file."""
+    if module_path not in _code_versions:
+        spec = find_spec(module_path)
+        origin = spec.origin if spec else None
+        data = Path(origin).read_bytes() if origin and os.path.exists(origin) else module_path.encode()
+        _code_versions[module_path] = hashlib.sha256(data).hexdigest()
+    return _code_versions[module_path]
+
+def task_key(task, module_path):
+    """Input hash for a task, or None if its agent is not memoizable."""
+    if task.get("to") not in MEMOIZABLE:
+        return None
+    material = {
+        "to": task.get("to"),
+        "payload": task.get("payload", {}),
+        "code": code_version(module_path),
+        "env": {k: os.getenv(k, "") for k in MEMO_ENV},
+        "secrets": {k: bool(os.getenv(k, "").strip()) for k in MEMO_SECRETS},
+    }
+    blob = json.dumps(material, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def lookup(key, out_dir):
+    """Return the memo entry for key if all of its artifacts still exist."""
+    entry = _load()["keys"].get(key)
+    if not entry:
+        return None
+    src = Path(out_dir) / entry["task_id"]
+    if not all((src / a).exists() for a in entry["artifacts"]):
+        return None
+    return entry
+
+def link_outputs(entry, task_id, out_dir):
+    """
+    Hard-link (or copy, across devices) a memoized artifact set into outputs/<task_id>.
+    Links are made in a temp dir that replaces outputs/<task_id> only once complete, so a
+    failure never leaves links to the source artifacts where a fallback run would write.
+    """
+    src = Path(out_dir) / entry["task_id"]
+    dst = Path(out_dir) / task_id
+    tmp = Path(out_dir) / f".{task_id}.linking-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    try:
+        for name in entry["artifacts"]:
+            try:
+                os.link(src / name, tmp / name)
+            except OSError:
+                shutil.copy2(src / name, tmp / name)
+        if dst.exists():
+            shutil.rmtree(dst)
+        os.replace(tmp, dst)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return list(entry["artifacts"])
+
+def cacheable(artifacts):
+    """False if any text artifact is an LLM error placeholder."""
+    for content in artifacts.values():
+        if isinstance(content, str) and content.lstrip().startswith(LLM_ERROR_PREFIXES):
+            return False
+    return True
+
+def record(key, task_id, artifacts):
+    """Make task_id's artifacts the memoized output set for key."""
+    with _locked():
+        memo = _load()
+        memo["keys"][key] = {"task_id": task_id, "artifacts": list(artifacts), "ts": time.time()}
+        _save(memo)
+
+def cycle_stats(executed):
+    """Summarize a cycle's execution summaries, including the memo hit rate."""
+    hits = sum(1 for e in executed if e.get("memo") == "hit")
+    misses = sum(1 for e in executed if e.get("memo") == "miss")
+    return {
+        "tasks": len(executed),
+        "done": sum(1 for e in executed if e.get("status") == "done"),
+        "failed": sum(1 for e in executed if e.get("status") == "failed"),
+        "requeued": sum(1 for e in executed if e.get("status") == "requeued"),
+        "memo_hits": hits,
+        "memo_misses": misses,
+        "memo_forced": sum(1 for e in executed if e.get("memo") == "forced"),
+        # None when no lookup happened (nothing memoizable, or --force)
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+    }
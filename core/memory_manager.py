@@ -2,27 +2,73 @@
 import os, json, numpy as np
 from sentence_transformers import SentenceTransformer
 import faiss
+from core.file_lock import file_lock, file_sig
 
 MODEL_NAME = "all-MiniLM-L6-v2"
 EMB_DIM = 384
+EMBED_BATCH = int(os.getenv("EMBED_BATCH", 32))
 
 class MemoryManager:
     def __init__(self, index_path="memory.index", store_path="memory_store.jsonl"):
         self.index_path = index_path
         self.store_path = store_path
+        # index and store are shared by worker processes; writes go through this lock
+        self.lock_path = index_path + ".lock"
         self.model = SentenceTransformer(MODEL_NAME)
+        self._load_index()
+        open(self.store_path, "a").close()
+
+    def _load_index(self):
         if os.path.exists(self.index_path):
             self.index = faiss.read_index(self.index_path)
         else:
             self.index = faiss.IndexFlatL2(EMB_DIM)
-        open(self.store_path, "a").close()
+        self._index_sig = file_sig(self.index_path)
+
+    def _sync_index(self):
+        # another process may have appended since we loaded; never write back a stale copy
+        if file_sig(self.index_path) != self._index_sig:
+            self._load_index()
 
     def add(self, content, metadata):
-        emb = self.model.encode([content])
+        self.add_batch([content], [metadata])
+
+    def add_batch(self, contents, metadatas):
+        # embed several items in one model call; callers keep batches small to bound memory
+        if not contents:
+            return
+        emb = self.model.encode(list(contents), batch_size=EMBED_BATCH)
         emb = np.array(emb).astype("float32")
-        self.index.add(emb)
-        with open(self.store_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps({"content":content,"metadata":metadata}, ensure_ascii=False) + "\n")
+        with file_lock(self.lock_path):
+            self._sync_index()
+            self.index.add(emb)
+            with open(self.store_path, "a", encoding="utf-8") as f:
+                for content, metadata in zip(contents, metadatas):
+                    f.write(json.dumps({"content":content,"metadata":metadata}, ensure_ascii=False) + "\n")
+            faiss.write_index(self.index, self.index_path)
+            self._index_sig = file_sig(self.index_path)
+
+    def search(self, query, k=5):
+        # returns stored items (content is the exact passage, metadata locates it)
+        with file_lock(self.lock_path):
+            self._sync_index()
+        if self.index.ntotal == 0:
+            return []
+        emb = np.array(self.model.encode([query])).astype("float32")
+        D, I = self.index.search(emb, k)
+        wanted = {int(i): float(d) for d, i in zip(D[0], I[0]) if i >= 0}
+        hits = {}
+        with open(self.store_path, "r", encoding="utf-8") as f:
+            for row, line in enumerate(f):
+                if row in wanted:
+                    item = json.loads(line)
+                    item["distance"] = wanted[row]
+                    hits[row] = item
+                    if len(hits) == len(wanted):
+                        break
+        return [hits[i] for i in wanted if i in hits]
 
     def save(self):
-        faiss.write_index(self.index, self.index_path)
+        # add/add_batch persist the index under the lock; writing our copy here could
+        # overwrite vectors appended by another process
+        pass
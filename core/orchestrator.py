@@ -3,7 +3,8 @@ import json
 import inspect
 from importlib import import_module
 from pathlib import Path
-from core.task_queue import pop_next
+from core.task_queue import pop_next, reclaim_expired
+from core import memo
 
 OUTPUT_DIR = Path("outputs")
 OUTPUT_DIR.mkdir(exist_ok=True)
@@ -26,20 +27,28 @@ def _call_module_level_run(module, task):
         return module.run(task)
     return None
 
-def _find_class_and_run(module, task):
+def _find_class_and_run(module, task, agents=None):
     for _, cls in inspect.getmembers(module, inspect.isclass):
         if getattr(cls, "__module__", None) != module.__name__:
             continue
         if hasattr(cls, "run") and callable(getattr(cls, "run")):
-            try:
-                inst = cls()
-            except Exception as e:
-                print(f"[orchestrator] Could not instantiate {cls}: {e}")
-                continue
+            inst = agents.get(cls) if agents is not None else None
+            if inst is None:
+                try:
+                    inst = cls()
+                except Exception as e:
+                    print(f"[orchestrator] Could not instantiate {cls}: {e}")
+                    continue
+                if agents is not None:
+                    agents[cls] = inst
             return inst.run(task)
     raise AttributeError(f"No runnable class/run callable found in {module.__name__}")
 
-def dispatch(task):
+def dispatch(task, agents=None):
+    """
+    Route a task to its agent. If an `agents` dict is given, agent instances are cached
+    in it and reused across calls (workers keep their agents warm this way).
+    """
     to = task.get("to")
     if not to:
         raise ValueError("Task missing 'to' field")
@@ -55,41 +64,80 @@ def dispatch(task):
     except Exception as e:
         raise RuntimeError(f"Module-level run error in {module_path}: {e}")
     # 2) class-level run
-    return _find_class_and_run(module, task)
+    return _find_class_and_run(module, task, agents)
+
+def _memo_key(task):
+    module_path = AGENT_MAP.get(task.get("to"))
+    if not module_path:
+        return None
+    try:
+        return memo.task_key(task, module_path)
+    except Exception as e:
+        print(f"[orchestrator] Could not hash {task.get('task_id')}: {e}")
+        return None
 
-def run_cycle(max_tasks=20):
+def execute_task(task, agents=None, force=False):
+    """
+    Dispatch one task and keep its artifacts in outputs/<task_id>.
+    If an identical task (same input hash) completed before, its outputs are linked
+    instead of re-running it, unless force is set. Returns an execution summary.
+    """
+    tid = task.get("task_id", "task")
+    key = _memo_key(task)
+    if key and not force:
+        try:
+            entry = memo.lookup(key, OUTPUT_DIR)
+            if entry:
+                artifacts = memo.link_outputs(entry, tid, OUTPUT_DIR)
+                print(f"[orchestrator] Memo hit {tid} <- {entry['task_id']}")
+                return {"task_id": tid, "status": "done", "artifacts": artifacts, "memo": "hit", "linked_from": entry["task_id"]}
+        except Exception as e:
+            # e.g. an artifact vanished between lookup and link: just run the task
+            print(f"[orchestrator] Memo link failed for {tid}, dispatching instead: {e}")
+    try:
+        print(f"[orchestrator] Dispatching {tid} -> {task.get('to')}")
+        res = dispatch(task, agents)
+        # normalize result into dict artifacts
+        task_out_dir = OUTPUT_DIR / tid
+        task_out_dir.mkdir(parents=True, exist_ok=True)
+        returned = {}
+        if isinstance(res, dict):
+            for fname, content in res.items():
+                p = task_out_dir / fname
+                if isinstance(content, (dict, list)):
+                    p.write_text(json.dumps(content, indent=2, ensure_ascii=False), encoding="utf-8")
+                else:
+                    p.write_text(str(content), encoding="utf-8")
+                returned[fname] = content
+        else:
+            # if agent returned plain text, save as output.txt
+            p = task_out_dir / "output.txt"
+            p.write_text(str(res), encoding="utf-8")
+            returned["output.txt"] = str(res)
+        summary = {"task_id": tid, "status": "done", "artifacts": list(returned.keys())}
+        if key:
+            # forced runs skipped the lookup, so they don't count toward the hit rate
+            summary["memo"] = "forced" if force else "miss"
+            if memo.cacheable(returned):
+                memo.record(key, tid, returned.keys())
+        return summary
+    except Exception as e:
+        print(f"[orchestrator] Task {tid} failed: {e}")
+        return {"task_id": tid, "status": "failed", "error": str(e)}
+
+def run_cycle(max_tasks=20, force=False):
     """
     Run up to max_tasks sequentially, keeping artifacts in outputs/<task_id> and
     returning a list of execution summaries.
     """
     executed = []
+    # tasks leased by a killed worker-mode run come back once their lease expires
+    _, dropped = reclaim_expired()
+    for tid in dropped:
+        executed.append({"task_id": tid, "status": "failed", "error": "lease expired; retries exhausted"})
     for _ in range(max_tasks):
         task = pop_next()
         if not task:
             break
-        tid = task.get("task_id", "task")
-        try:
-            print(f"[orchestrator] Dispatching {tid} -> {task.get('to')}")
-            res = dispatch(task)
-            # normalize result into dict artifacts
-            task_out_dir = OUTPUT_DIR / tid
-            task_out_dir.mkdir(parents=True, exist_ok=True)
-            returned = {}
-            if isinstance(res, dict):
-                for fname, content in res.items():
-                    p = task_out_dir / fname
-                    if isinstance(content, (dict, list)):
-                        p.write_text(json.dumps(content, indent=2, ensure_ascii=False), encoding="utf-8")
-                    else:
-                        p.write_text(str(content), encoding="utf-8")
-                    returned[fname] = content
-            else:
-                # if agent returned plain text, save as output.txt
-                p = task_out_dir / "output.txt"
-                p.write_text(str(res), encoding="utf-8")
-                returned["output.txt"] = str(res)
-            executed.append({"task_id": tid, "status": "done", "artifacts": list(returned.keys())})
-        except Exception as e:
-            print(f"[orchestrator] Task {tid} failed: {e}")
-            executed.append({"task_id": tid, "status": "failed", "error": str(e)})
+        executed.append(execute_task(task, force=force))
     return executed
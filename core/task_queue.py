@@ -1,25 +1,172 @@
 # core/task_queue.py
-import json, os
+import json, os, time
 from pathlib import Path
+from core.file_lock import file_lock, write_atomic
 TASKS_FILE = Path("tasks_queue.json")
+LEASES_FILE = Path("tasks_leases.json")
+LOCK_FILE = Path("tasks_queue.lock")
+# workers renew their lease every LEASE_SECONDS / 3, so a lease only expires if its worker is gone
+LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", 120))
+
+def _locked():
+    # exclusive lock so several worker processes can share the queue files
+    return file_lock(LOCK_FILE)
+
+def _load_json(path, empty):
+    if not path.exists():
+        return empty
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError as e:
+        # keep the damaged file for inspection instead of failing every later call
+        aside = path.with_name(path.name + ".corrupt")
+        os.replace(path, aside)
+        print(f"[task_queue] {path} is not valid JSON ({e}); moved to {aside}")
+        return empty
 
 def load_tasks():
-    if not TASKS_FILE.exists():
-        return []
-    return json.loads(TASKS_FILE.read_text(encoding="utf-8"))
+    return _load_json(TASKS_FILE, [])
 
 def save_tasks(tasks):
-    TASKS_FILE.write_text(json.dumps(tasks, indent=2, ensure_ascii=False), encoding="utf-8")
+    write_atomic(TASKS_FILE, json.dumps(tasks, indent=2, ensure_ascii=False))
 
 def push_task(task):
-    tasks = load_tasks()
-    tasks.append(task)
-    save_tasks(tasks)
+    with _locked():
+        tasks = load_tasks()
+        tasks.append(task)
+        save_tasks(tasks)
 
 def pop_next():
-    tasks = load_tasks()
-    if not tasks:
-        return None
-    task = tasks.pop(0)
-    save_tasks(tasks)
-    return task
+    with _locked():
+        tasks = load_tasks()
+        leases = load_leases()
+        # leases left behind by a killed worker-mode run go back to the queue
+        if _reclaim_expired(tasks, leases) != ([], []):
+            save_tasks(tasks)
+            save_leases(leases)
+        if not tasks:
+            save_tasks(tasks)
+            return None
+        task = tasks.pop(0)
+        save_tasks(tasks)
+        return task
+
+# --- leases (multi-process worker mode) ---
+
+def load_leases():
+    return _load_json(LEASES_FILE, {})
+
+def save_leases(leases):
+    write_atomic(LEASES_FILE, json.dumps(leases, indent=2, ensure_ascii=False))
+
+def _requeue(tasks, lease):
+    """Put a leased task back at the front of the queue; returns False if it is out of retries."""
+    task = lease["task"]
+    max_retries = task.get("retry_policy", {}).get("max_retries", 2)
+    attempts = lease.get("attempts", 1)
+    if attempts > max_retries:
+        return False
+    task["attempts"] = attempts
+    tasks.insert(0, task)
+    return True
+
+def _dependencies(task):
+    return set(task.get("dependencies") or []) | set(task.get("payload", {}).get("references") or [])
+
+def has_pending():
+    """True while tasks are still queued (some may be waiting on dependencies)."""
+    with _locked():
+        return bool(load_tasks())
+
+def _reclaim_expired(tasks, leases, now=None):
+    """Move expired leases back into tasks. Returns (requeued_ids, dropped_ids)."""
+    now = now or time.time()
+    requeued, dropped = [], []
+    for tid, lease in list(leases.items()):
+        if lease["expires"] >= now:
+            continue
+        del leases[tid]
+        if _requeue(tasks, lease):
+            requeued.append(tid)
+        else:
+            dropped.append(tid)
+            print(f"[task_queue] Lease on {tid} expired and retries are exhausted; dropping it.")
+    return requeued, dropped
+
+def reclaim_expired():
+    """Return expired leases to the queue. Returns (requeued_ids, dropped_ids)."""
+    with _locked():
+        tasks = load_tasks()
+        leases = load_leases()
+        requeued, dropped = _reclaim_expired(tasks, leases)
+        if requeued or dropped:
+            save_tasks(tasks)
+            save_leases(leases)
+    return requeued, dropped
+
+def lease_next(worker_id, lease_seconds=LEASE_SECONDS):
+    """
+    Lease the first ready task to worker_id. Returns None if no task is ready.
+    Expired leases are reclaimed by the caller via reclaim_expired so drops get reported.
+    """
+    with _locked():
+        tasks = load_tasks()
+        leases = load_leases()
+        # a task is ready once nothing it depends on is still queued ahead of it or leased
+        pending = set(leases)
+        ready = None
+        for i, t in enumerate(tasks):
+            if not pending.intersection(_dependencies(t)):
+                ready = i
+                break
+            pending.add(t.get("task_id"))
+        if ready is None:
+            return None
+        task = tasks.pop(ready)
+        tid = task.get("task_id", "task")
+        leases[tid] = {"task": task, "worker": worker_id, "expires": time.time() + lease_seconds,
+                       "attempts": task.get("attempts", 0) + 1}
+        # lease first: a crash in between leaves the task queued and leased (a duplicate), not lost
+        save_leases(leases)
+        save_tasks(tasks)
+        return task
+
+def renew_lease(task_id, worker_id, lease_seconds=LEASE_SECONDS):
+    """Extend a lease held by worker_id (heartbeat). Returns False if the lease was lost."""
+    with _locked():
+        leases = load_leases()
+        lease = leases.get(task_id)
+        if not lease or lease["worker"] != worker_id:
+            return False
+        lease["expires"] = time.time() + lease_seconds
+        save_leases(leases)
+        return True
+
+def complete_lease(task_id, worker_id):
+    """Drop the lease if worker_id still owns it. Returns False if the lease was lost."""
+    with _locked():
+        leases = load_leases()
+        lease = leases.get(task_id)
+        if not lease or lease["worker"] != worker_id:
+            return False
+        del leases[task_id]
+        save_leases(leases)
+        return True
+
+def release_worker(worker_id):
+    """
+    Return every lease held by worker_id to the queue (used when a worker crashes).
+    Returns (requeued_ids, dropped_ids); dropped tasks exhausted their retry_policy.
+    """
+    requeued, dropped = [], []
+    with _locked():
+        tasks = load_tasks()
+        leases = load_leases()
+        for tid, lease in list(leases.items()):
+            if lease["worker"] != worker_id:
+                continue
+            del leases[tid]
+            (requeued if _requeue(tasks, lease) else dropped).append(tid)
+        save_tasks(tasks)
+        save_leases(leases)
+    return requeued, dropped
@@ -0,0 +1,112 @@
+# core/workers.py
+"""
+Multi-process worker mode: N worker processes lease tasks from the shared queue,
+each keeping its own warm agent instances. A supervisor restarts crashed workers
+and returns their leases to the queue.
+"""
+import os, time, queue, threading, multiprocessing as mp
+from core.orchestrator import execute_task
+from core.task_queue import (lease_next, renew_lease, complete_lease, release_worker, reclaim_expired,
+                             has_pending, LEASE_SECONDS)
+
+MAX_RESTARTS = int(os.getenv("WORKER_MAX_RESTARTS", 3))
+POLL_SECONDS = 0.5
+
+def _worker_main(worker_id, budget, results, force=False):
+    agents = {}  # warm agents, reused for every task this worker runs
+    while True:
+        # budget is shared so max_tasks caps the whole run, not each worker
+        with budget.get_lock():
+            if budget.value <= 0:
+                break
+            budget.value -= 1
+        task = lease_next(worker_id)
+        if not task:
+            with budget.get_lock():
+                budget.value += 1
+            if not has_pending():
+                break
+            # remaining tasks wait on dependencies still running in other workers
+            time.sleep(POLL_SECONDS)
+            continue
+        tid = task.get("task_id", "task")
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat, args=(tid, worker_id, stop), daemon=True)
+        beat.start()
+        try:
+            summary = execute_task(task, agents, force)
+        finally:
+            stop.set()
+            beat.join()
+        summary["worker"] = worker_id
+        if not complete_lease(tid, worker_id):
+            # the lease expired and was reclaimed meanwhile; the task may run again elsewhere
+            print(f"[worker {worker_id}] Lost lease on {tid} before completing it.")
+            summary["lease_lost"] = True
+        results.put(summary)
+
+def _heartbeat(task_id, worker_id, stop):
+    while not stop.wait(LEASE_SECONDS / 3):
+        if not renew_lease(task_id, worker_id):
+            break
+
+def _start(ctx, worker_id, budget, results, force=False):
+    p = ctx.Process(target=_worker_main, args=(worker_id, budget, results, force), name=worker_id)
+    p.start()
+    return p
+
+def run_workers(workers, max_tasks=20, max_restarts=MAX_RESTARTS, force=False):
+    """
+    Run up to max_tasks across `workers` processes and return the execution summaries.
+    Workers exit once the queue is empty or the task budget is spent.
+    """
+    ctx = mp.get_context()
+    budget = ctx.Value("i", max_tasks)
+    results = ctx.Queue()
+    procs = {}
+    restarts = {}
+    for i in range(workers):
+        wid = f"w{i}"
+        procs[wid] = _start(ctx, wid, budget, results, force)
+        restarts[wid] = 0
+    executed = []
+    requeued_ids = set()
+    while procs:
+        try:
+            executed.append(results.get(timeout=0.5))
+        except queue.Empty:
+            pass
+        # leases whose worker stopped heartbeating (or from a killed earlier run)
+        _, dropped = reclaim_expired()
+        for tid in dropped:
+            executed.append({"task_id": tid, "status": "failed", "error": "lease expired; retries exhausted"})
+        for wid, p in list(procs.items()):
+            if p.is_alive():
+                continue
+            p.join()
+            if p.exitcode != 0:
+                requeued, dropped = release_worker(wid)
+                print(f"[supervisor] Worker {wid} crashed (exit {p.exitcode}); returned leases: {requeued}")
+                # the crashed worker spent budget on these; give it back so they run again
+                with budget.get_lock():
+                    budget.value += len(requeued)
+                requeued_ids.update(requeued)
+                for tid in dropped:
+                    executed.append({"task_id": tid, "status": "failed", "error": "worker crashed; retries exhausted", "worker": wid})
+                if restarts[wid] < max_restarts:
+                    restarts[wid] += 1
+                    procs[wid] = _start(ctx, wid, budget, results, force)
+                    continue
+                print(f"[supervisor] Worker {wid} exceeded {max_restarts} restarts; not restarting.")
+            del procs[wid]
+    # collect anything flushed by the last workers to exit
+    while True:
+        try:
+            executed.append(results.get_nowait())
+        except queue.Empty:
+            break
+    # requeued tasks that never ran again (budget or restarts exhausted) still show up in the report
+    finished = {e["task_id"] for e in executed}
+    for tid in sorted(requeued_ids - finished):
+        executed.append({"task_id": tid, "status": "requeued", "error": "worker crashed; task returned to queue"})
+    return executed
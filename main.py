@@ -1,18 +1,30 @@
 # main.py
-import os, time
+import os, time, argparse
 from agents.commander import Commander
 from core.orchestrator import run_cycle
+from core.memo import cycle_stats
 
 SLEEP_SECONDS = int(os.getenv("LOOP_SLEEP_SECONDS", 86400))  # default 24h
 
-def bootstrap():
+def bootstrap(workers=1, force=False):
     # run commander to convert command.txt into tasks
     c = Commander()
     c.run(None)
     # run an orchestrator cycle to process tasks
-    results = run_cycle(max_tasks=20)
+    if workers > 1:
+        from core.workers import run_workers
+        results = run_workers(workers, max_tasks=20, force=force)
+    else:
+        results = run_cycle(max_tasks=20, force=force)
     print("Cycle results:", results)
+    print("Cycle summary:", cycle_stats(results))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", 1)),
+                        help="number of worker processes leasing tasks from the queue (default 1: run in-process)")
+    parser.add_argument("--force", action="store_true",
+                        help="ignore memoized task outputs and re-run every task")
+    args = parser.parse_args()
     # Run once (for Colab/GitHub Action). For continuous local run use while loop.
-    bootstrap()
+    bootstrap(workers=args.workers, force=args.force)